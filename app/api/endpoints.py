@@ -1,36 +1,43 @@
+import logging
 from fastapi import APIRouter, Request, Form, Query, HTTPException, Depends
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
+from pydantic import BaseModel
 from typing import Optional, List
-import copy
 import random
-import time
 import requests
 import asyncio
+import threading
 from concurrent.futures import ThreadPoolExecutor
+from cachetools import cached
+from cachetools.keys import hashkey
 
 from ..services.music_service import music_service
 from ..services.connection_manager import manager
-from ..core.state import out_tracks, default_context, next_song_dt, RESULT_CACHE
-from ..utils.helpers import find_video_id, detect_verses, generate_qr_base64
-from ..core.config import RAPIDAPI_KEY, RAPIDAPI_HOST, RAPIDAPI_URL
+from ..core.state import out_tracks, default_context, next_song_dt, CHARTS_CACHE
+from ..utils.helpers import detect_verses, generate_qr_base64, ORJSONResponse
+from ..core.config import RAPIDAPI_KEY, RAPIDAPI_HOST, RAPIDAPI_URL, LRCLIB_URL, MUSIC_URL_PREFIX
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
-@router.on_event("startup")
-async def startup_event():
-    """Start building the music database in the background on app startup."""
-    from ..core import state
-    state.server_start_time = time.time()
-    await music_service.initialize()
+def render_template(name: str, context: dict) -> HTMLResponse:
+    """
+    Renders a template in one pass from the cached compiled template.
+    The template needs `request` in its context (url_for).
+    """
+    template = templates.env.get_template(name)
+    return HTMLResponse(template.render(**context))
 
 @router.get("/", response_class=HTMLResponse)
 async def index_webview(request: Request):
-    default_context["request"] = request
     if "music_type" not in default_context:
         default_context["music_type"] = "songs"
-    return templates.TemplateResponse("index.html", default_context)
+    # Inject the request per response so the shared context never holds one
+    context = {**default_context, "request": request}
+    return render_template("index.html", context)
 
 @router.post("/search/")
 async def search_endpoint(
@@ -46,7 +53,7 @@ async def search_endpoint(
     """
     Search a song on YouTube Music (by query) and return top recommendations (default limit 10).
     """
-    print(f"Searching for: {query} (type: {music_type}, videoId: {videoId}, refresh: {refresh})")
+    logger.info("Searching for: %s (type: %s, videoId: %s, refresh: %s)", query, music_type, videoId, refresh)
     
     try:
         if nextPlay and videoId:
@@ -70,27 +77,27 @@ async def search_endpoint(
                 refresh=refresh
             )
 
-        if request.headers.get("Accept") == "application/json":
-            return JSONResponse(content=context)
-
+        # API clients get JSON straight away; only browsers pay for template rendering
+        accept = request.headers.get("Accept", "")
+        if "application/json" in accept:
+            return ORJSONResponse(content=context)
 
         context["request"] = request
-        return templates.TemplateResponse("index.html", context)
+        return render_template("index.html", context)
 
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Search failed for %r", query)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 
 @router.get("/suggestions/")
-def get_search_suggestions(query: str = Query(..., min_length=1)):
+async def get_search_suggestions(query: str = Query(..., min_length=1)):
     """
     Get search suggestions for a given query.
     """
     try:
-        suggestions = music_service.get_suggestions(query)
+        suggestions = await asyncio.to_thread(music_service.get_suggestions, query)
         # Standardize response
         # ytmusicapi usually returns a list of dicts with 'title' runs, or sometimes simple things.
         # But commonly it attempts to look like the web suggestion.
@@ -114,53 +121,84 @@ def get_search_suggestions(query: str = Query(..., min_length=1)):
         
         return {"suggestions": final_list}
     except Exception as e:
-        print(f"Suggestion error: {e}")
+        logger.warning("Suggestion error: %s", e)
         return {"suggestions": []}
 
 
 @router.get("/lyrics/")
-def get_lyrics_endpoint(title: str = Query(..., example="MASAKALI"), artist: Optional[str] = Query(None)):
+async def get_lyrics_endpoint(title: str = Query(..., example="MASAKALI"), artist: Optional[str] = Query(None)):
     """
-    Directly calls RapidAPI (legacy endpoint)
+    Lyrics by title/artist from LRCLIB or RapidAPI (legacy endpoint). `data` is a
+    list of LRC lines ("[mm:ss.xx] text") whichever `source` answered.
     """
-    # For now, replicate logic or call service.
-    # The original endpoint returned wrapper around RapidAPI response.
-    # We can use music_service.fetch_lyrics but it attempts YT first if browseId provided.
-    # Here we don't have browseId.
+    # Without a browseId, music_service.fetch_lyrics skips YT and goes to the other sources.
     
-    if not RAPIDAPI_KEY:
+    if not RAPIDAPI_KEY and not LRCLIB_URL:
          raise HTTPException(status_code=500, detail="Missing RAPIDAPI_KEY")
     
-    # We can adapt music_service.fetch_lyrics to force RapidAPI if we want, or rely on its fallback.
-    # But `fetch_lyrics` does a YT check only if browseId is present.
-    # So calling it without browseId should fall back to RapidAPI instantly.
-    
-    result = music_service.fetch_lyrics(title, artist, browseId=None, delay=0.5)
+    result = await music_service.fetch_lyrics(title, artist, browseId=None)
     if "error" in result:
          # Need to map internal errors to HTTP exceptions to match old behavior
          # Original code raised HTTPException on some errors.
          if result["status"] == 500: raise HTTPException(status_code=500, detail=result["error"])
          if result["status"] == 502: raise HTTPException(status_code=502, detail=result["error"])
          if result["status"] == 404: raise HTTPException(status_code=404, detail=result["error"])
+         if result["status"] == 429: raise HTTPException(status_code=429, detail=result["error"])
     
-    return result
+    return ORJSONResponse(content=result)
+
+
+class LyricsQuery(BaseModel):
+    title: str
+    artist: Optional[str] = None
+
+# Most lookups accepted by one /lyrics/batch/ call
+LYRICS_BATCH_MAX = 50
+
+@router.post("/lyrics/batch/")
+async def batch_lyrics(items: List[LyricsQuery]):
+    """
+    Look up lyrics for up to 50 {title, artist} pairs in one call. Lookups run
+    concurrently through the same cache, single-flight and rate limits as /lyrics/.
+    """
+    if len(items) > LYRICS_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"at most {LYRICS_BATCH_MAX} items per batch")
+
+    responses = await asyncio.gather(
+        *(music_service.fetch_lyrics(item.title, item.artist, browseId=None) for item in items),
+        return_exceptions=True
+    )
+    results = []
+    for item, response in zip(items, responses):
+        if isinstance(response, Exception):
+            response = {"status": 500, "error": str(response)}
+        results.append({"title": item.title, "artist": item.artist, **response})
+    return ORJSONResponse(content={"results": results})
 
 
 @router.get("/track/{idx}/")
-def get_track_lyrics_by_index(idx: int):
+async def get_track_lyrics_by_index(idx: int, playlist: Optional[int] = Query(None)):
     from ..core import state
     if idx < 0:
         raise HTTPException(status_code=400, detail="idx must be >= 0")
 
+    # Index into the playlist the client was served (its playlist_id) when given,
+    # otherwise into whatever is currently shared
+    tracks = state.out_tracks
+    if playlist is not None:
+        tracks = state.PLAYLISTS.get(playlist)
+        if tracks is None:
+            raise HTTPException(status_code=404, detail=f"playlist {playlist} expired or unknown")
+
     try:
-        if idx >= len(state.out_tracks):
-            raise HTTPException(status_code=400, detail=f"idx {idx} out of range (0..{len(state.out_tracks)-1})")
+        if idx >= len(tracks):
+            raise HTTPException(status_code=400, detail=f"idx {idx} out of range (0..{len(tracks)-1})")
 
-        t = state.out_tracks[idx]
+        t = tracks[idx]
         title = t.get("title", "")
         artist_name = t.get("artist", "")
         video_id = t.get("videoId", "")
-        music_url = f"https://music.youtube.com/watch?v={video_id}" if video_id else ""
+        music_url = MUSIC_URL_PREFIX + video_id if video_id else ""
 
         selected = {
             "index": idx,
@@ -170,6 +208,8 @@ def get_track_lyrics_by_index(idx: int):
             "music_url": music_url
         }
 
+    except HTTPException:
+        raise
     except requests.HTTPError as e:
         raise HTTPException(status_code=502, detail=f"Upstream HTTP error: {e}")
     except Exception as e:
@@ -177,7 +217,9 @@ def get_track_lyrics_by_index(idx: int):
 
     # Fetch lyrics
     browse_id = t.get("browseId") # Might be None
-    lyrics_response = music_service.fetch_lyrics(title, artist_name, browseId=browse_id)
+    lyrics_response = await music_service.fetch_lyrics(title, artist_name, browseId=browse_id)
+    # "Next track" is the usual follow-up, so warm the cache for the next two
+    music_service.prefetch_lyrics(tracks[idx + 1:idx + 3])
     
     verses = []
     lyrics_data = lyrics_response.get("data")
@@ -206,56 +248,67 @@ def get_track_lyrics_by_index(idx: int):
     else:
         state.next_song_dt["timestamp"] = 20
 
-    return {"selected_track": selected, "verse": verses, "source": lyrics_response.get("source", "Unknown")}
+    return ORJSONResponse(content={"selected_track": selected, "verse": verses, "source": lyrics_response.get("source", "Unknown")})
 
 @router.post("/radio/")
 async def start_radio_mode(
     videoId: str = Form(...),
     limit: int = Form(50)
 ):
-    print(f"Starting Radio Mode for videoId: {videoId}")
+    logger.info("Starting Radio Mode for videoId: %s", videoId)
     try:
         result = await music_service.start_radio(video_id=videoId, limit=limit)
-        return result
+        return ORJSONResponse(content=result)
     except Exception as e:
-        print(f"Error starting radio: {e}")
+        logger.error("Error starting radio: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@cached(CHARTS_CACHE, key=lambda country: hashkey(country), lock=threading.Lock())
+def _build_charts(country: str):
+    """
+    Formats the recommender's dynamic playlist into (top_songs, trending).
+    Raises when the recommender has nothing yet, so failures are never cached.
+    """
+    dynamic_playlist = music_service.recommender.generate_dynamic_playlist(50)
+    if not dynamic_playlist:
+        raise Exception("Recommender returned empty")
+
+    def category_label(category):
+        return category[:1].upper() + category[1:]
+
+    formatted_items = [
+        {
+            "title": s["title"],
+            "artist": s["artist"],
+            "videoId": s["videoId"],
+            "browseId": "",
+            # The recommender stores only videoId; the link is derived here
+            "music_url": MUSIC_URL_PREFIX + s["videoId"] if s.get("videoId") else "",
+            "thumbnail": s.get("thumbnail") or "",
+            "type": "chart",
+            "labels": ["Trending", category_label(s.get("category", ""))],
+            "weight": 10
+        }
+        for s in dynamic_playlist
+    ]
+    return formatted_items[:25], formatted_items[25:]
+
+
 @router.get("/charts/")
-def get_charts(country: str = Query("IN", min_length=2, max_length=2)):
-    print(f"Fetching charts for {country} using AsyncIndianMusicRecommender...")
+async def get_charts(country: str = Query("IN", min_length=2, max_length=2)):
+    logger.info("Fetching charts for %s using AsyncIndianMusicRecommender...", country)
     
     top_songs = []
     trending = []
     top_videos = [] # Not used in output but var existed in original
 
     try:
-        # Use Recommender via music_service
-        dynamic_playlist = music_service.recommender.generate_dynamic_playlist(50)
-        
-        if dynamic_playlist:
-            formatted_items = []
-            for s in dynamic_playlist:
-                formatted_items.append({
-                    "title": s["title"],
-                    "artist": s["artist"],
-                    "videoId": s["videoId"],
-                    "browseId": "",
-                    "music_url": s.get("music_url", s.get("url", "")), # Safety check
-                    "thumbnail": s["thumbnail"],
-                    "type": "chart",
-                    "labels": ["Trending", s.get("category", "")[:1].upper() + s.get("category", "")[1:]],
-                    "weight": 10
-                })
-            
-            top_songs = formatted_items[:25]
-            trending = formatted_items[25:]
-        else:
-             raise Exception("Recommender returned empty")
+        # Use Recommender via music_service (formatted result cached briefly per country)
+        top_songs, trending = await asyncio.to_thread(_build_charts, country)
 
     except Exception as e:
-        print(f"Recommender failed/not ready ({e}). Using Hardcoded Failsafe.")
+        logger.warning("Recommender failed/not ready (%s). Using Hardcoded Failsafe.", e)
         failsafe_tracks = [
             {"videoId": "k4yXQkGDbLY", "title": "Shape of You", "artist": "Ed Sheeran", "thumbnail": "https://i.ytimg.com/vi/k4yXQkGDbLY/hqdefault.jpg"},
             {"videoId": "JGwWNGJdvx8", "title": "Despacito", "artist": "Luis Fonsi", "thumbnail": "https://i.ytimg.com/vi/JGwWNGJdvx8/hqdefault.jpg"},
@@ -263,22 +316,24 @@ def get_charts(country: str = Query("IN", min_length=2, max_length=2)):
             {"videoId": "09R8_2nJtjg", "title": "Sugar", "artist": "Maroon 5", "thumbnail": "https://i.ytimg.com/vi/09R8_2nJtjg/hqdefault.jpg"}
         ]
         
-        failsafe_processed = []
-        for t in failsafe_tracks:
-             failsafe_processed.append({
+        failsafe_processed = [
+            {
                 "title": t["title"], "artist": t["artist"], "videoId": t["videoId"],
-                "browseId": "", "music_url": f"https://music.youtube.com/watch?v={t['videoId']}",
+                "browseId": "", "music_url": MUSIC_URL_PREFIX + t["videoId"],
                 "thumbnail": t["thumbnail"], "type": "chart", "labels": ["Hit"], "weight": 10
-             })
+            }
+            for t in failsafe_tracks
+        ]
         top_songs = failsafe_processed
         trending = failsafe_processed
     
-    return {
+    # Plain dicts of strings: skip FastAPI's jsonable_encoder walk and encode directly
+    return ORJSONResponse(content={
         "country": country,
         "top_songs": top_songs,
         "top_videos": top_videos,
         "trending": trending
-    }
+    })
 @router.get("/qr/")
 async def get_qr_code(request: Request):
     """
@@ -290,5 +345,5 @@ async def get_qr_code(request: Request):
     scheme = request.headers.get("x-forwarded-proto", "http")
     pairing_url = f"{scheme}://{host}/"
     
-    img_base64 = generate_qr_base64(pairing_url)
+    img_base64 = await asyncio.to_thread(generate_qr_base64, pairing_url)
     return JSONResponse(content=img_base64)
@@ -1,14 +1,25 @@
+import logging
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 import asyncio
 import time
-import json
+import orjson
 from ..services.music_service import music_service
 from ..services.connection_manager import manager, webapp_broadcaster
 from ..core.state import default_context
 from ..utils.helpers import generate_qr_base64
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+async def _send(websocket: WebSocket, obj: dict):
+    """Send a JSON message encoded with orjson."""
+    await websocket.send_text(orjson.dumps(obj).decode())
+
+async def _receive(websocket: WebSocket):
+    """Receive a JSON message decoded with orjson."""
+    return orjson.loads(await websocket.receive_text())
+
 @router.websocket("/ws/sync")
 async def websocket_sync_hub(websocket: WebSocket, role: str = Query("controller")):
     """
@@ -17,16 +28,16 @@ async def websocket_sync_hub(websocket: WebSocket, role: str = Query("controller
     """
     await manager.connect(websocket, role)
     # Send initial state (e.g. current volume and mute status)
-    await websocket.send_json({"type": "vol", "data": {"volume": default_context.get("maxVol", 100)}})
-    await websocket.send_json({"type": "mute", "data": {"isMuted": default_context.get("isMuted", False)}})
+    await _send(websocket, {"type": "vol", "data": {"volume": default_context.get("maxVol", 100)}})
+    await _send(websocket, {"type": "mute", "data": {"isMuted": default_context.get("isMuted", False)}})
     
     try:
         while True:
-            data = await websocket.receive_json()
+            data = await _receive(websocket)
             msg_type = data.get("type")
             msg_data = data.get("data")
             
-            print(f"[WS Sync] Received {msg_type} from {role}")
+            logger.debug("[WS Sync] Received %s from %s", msg_type, role)
 
             if msg_type == "ping":
                 # Debug playback time from player if provided
@@ -35,7 +46,7 @@ async def websocket_sync_hub(websocket: WebSocket, role: str = Query("controller
                     duration = msg_data.get("duration", 0)
                     v_id = msg_data.get("videoId", "unknown")
                     p_state = msg_data.get("state", -1)
-                    print(f"[WS Heartbeat] Player Sync - Video: {v_id} | Time: {c_time:.2f}s / {duration:.2f}s | State: {p_state}")
+                    logger.debug("[WS Heartbeat] Player Sync - Video: %s | Time: %.2fs / %.2fs | State: %s", v_id, c_time, duration, p_state)
                     
                     # Broadcast to controllers so they can show current progress
                     await manager.broadcast({
@@ -49,7 +60,7 @@ async def websocket_sync_hub(websocket: WebSocket, role: str = Query("controller
                         }
                     }, target_role="controller")
                 
-                await websocket.send_json({"type": "pong", "ts": time.time()})
+                await _send(websocket, {"type": "pong", "ts": time.time()})
             
             elif msg_type == "play":
                 # Use the logic from websocket_play_route for advanced play handling
@@ -82,8 +93,10 @@ async def websocket_sync_hub(websocket: WebSocket, role: str = Query("controller
                         refresh=refresh
                     )
                 
-                # Broadcast search results to all controllers to update their UI
-                await webapp_broadcaster.send("search_result", context)
+                # Broadcast search results to all controllers to update their UI,
+                # unless a newer rebuild already replaced this one
+                if music_service.is_published(context):
+                    await webapp_broadcaster.send("search_result", context)
             
             elif msg_type == "vol":
                 if msg_data and "volume" in msg_data:
@@ -99,19 +112,19 @@ async def websocket_sync_hub(websocket: WebSocket, role: str = Query("controller
             
             elif msg_type == "control":
                 # Sync playback control to everyone (Play/Pause/Next/Prev)
-                print(f"[WS Sync] Broadcasting control to all: {msg_data}")
+                logger.info("[WS Sync] Broadcasting control to all: %s", msg_data)
                 await manager.broadcast({"type": "control", "data": msg_data}, sender=websocket)
             
             elif msg_type == "qr":
                 url = msg_data.get("url")
                 if url:
-                    img_base64 = generate_qr_base64(url)
-                    await websocket.send_json({"type": "qr", "data": {"img": img_base64, "url": url}})
+                    img_base64 = await asyncio.to_thread(generate_qr_base64, url)
+                    await _send(websocket, {"type": "qr", "data": {"img": img_base64, "url": url}})
 
             elif msg_type == "suggest":
                 query = msg_data.get("query")
                 if query:
-                    suggestions = music_service.get_suggestions(query)
+                    suggestions = await asyncio.to_thread(music_service.get_suggestions, query)
                     
                     # Clean up suggestions
                     final_list = []
@@ -125,16 +138,17 @@ async def websocket_sync_hub(websocket: WebSocket, role: str = Query("controller
                     
                     final_list = list(dict.fromkeys(final_list)) # Deduplicate
                     
-                    await websocket.send_json({"type": "suggestions", "data": {"suggestions": final_list}})
+                    await _send(websocket, {"type": "suggestions", "data": {"suggestions": final_list}})
 
             elif msg_type == "radio":
                 video_id = msg_data.get("videoId")
                 if video_id:
                     limit = int(msg_data.get("limit", 50))
-                    print(f"[WS Sync] Global Radio Start: {video_id}")
+                    logger.info("[WS Sync] Global Radio Start: %s", video_id)
                     result = await music_service.start_radio(video_id=video_id, limit=limit)
                     # Broadcast the results to all controllers to update their UI
-                    await webapp_broadcaster.send("radio_result", result)
+                    if music_service.is_published(result):
+                        await webapp_broadcaster.send("radio_result", result)
 
             elif msg_type == "search":
                 # Perform global search and broadcast results to everyone
@@ -142,21 +156,22 @@ async def websocket_sync_hub(websocket: WebSocket, role: str = Query("controller
                 limit = int(msg_data.get("limit", 50))
                 is_refresh = msg_data.get("refresh", False)
                 music_type = msg_data.get("music_type", "songs")
-                print(f"[WS Sync] Received search request: {query} (type: {music_type}, refresh: {is_refresh})")
-                print(f"[WS Sync] Global Search: {query}")
+                logger.info("[WS Sync] Received search request: %s (type: %s, refresh: %s)", query, music_type, is_refresh)
+                logger.info("[WS Sync] Global Search: %s", query)
                 result = await music_service.perform_search(
                     query=query,
                     limit=limit,
                     music_type=music_type,
                     refresh=is_refresh
                 )
-                await webapp_broadcaster.send("search_result", result)
+                if music_service.is_published(result):
+                    await webapp_broadcaster.send("search_result", result)
 
 
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception as e:
-        print(f"WebSocket Error: {e}")
+        logger.warning("WebSocket Error: %s", e)
         manager.disconnect(websocket)
     finally:
         try:
@@ -179,7 +194,13 @@ async def websocket_vol_endpoint(websocket: WebSocket):
     try:
         while True:
             vol = await websocket.receive_text()
-            await manager.broadcast({"type": "vol", "data": {"volume": vol}})
+            try:
+                volume = int(float(vol))
+            except (ValueError, OverflowError):
+                continue
+            # Pre-formatted frame: no dict building or JSON encoding per message
+            payload = f'{{"type":"vol","data":{{"volume":{volume}}}}}'
+            manager.publish_vol(payload)
     except: pass
 
 @router.websocket("/ws/qr/")
@@ -189,7 +210,7 @@ async def websocket_qr_endpoint(websocket: WebSocket):
         while True:
             url = await websocket.receive_text()
             if url:
-                img_base64 = generate_qr_base64(url)
+                img_base64 = await asyncio.to_thread(generate_qr_base64, url)
                 await websocket.send_text(img_base64)
     except: pass
 
@@ -199,7 +220,7 @@ async def websocket_player_endpoint(websocket: WebSocket):
     try:
         while True:
             data = await websocket.receive_text()
-            await manager.broadcast({"type": "control", "data": json.loads(data)})
+            await manager.broadcast({"type": "control", "data": orjson.loads(data)})
     except: pass
     
 @router.websocket("/ws/play")
@@ -211,7 +232,7 @@ async def websocket_play_route(websocket: WebSocket):
     await websocket.accept()
     try:
         while True:
-            data = await websocket.receive_json()
+            data = await _receive(websocket)
             # Extract parameters similar to the HTTP Form
             query = data.get("query")
             if not query:
@@ -224,7 +245,7 @@ async def websocket_play_route(websocket: WebSocket):
             videoId = data.get("videoId")
             refresh = bool(data.get("refresh", False))
             
-            print(f"[WS Play] Handling: {query}")
+            logger.info("[WS Play] Handling: %s", query)
             
             if videoId:
                 # Use new Smart Play & Radio flow
@@ -254,7 +275,7 @@ async def websocket_play_route(websocket: WebSocket):
     except WebSocketDisconnect:
         pass
     except Exception as e:
-        print(f"WS Play Route Error: {e}")
+        logger.warning("WS Play Route Error: %s", e)
     finally:
         try:
             await websocket.close()
@@ -270,23 +291,23 @@ async def websocket_radio_route(websocket: WebSocket):
     await websocket.accept()
     try:
         while True:
-            data = await websocket.receive_json()
+            data = await _receive(websocket)
             videoId = data.get("videoId")
             if not videoId:
                 continue
                 
             limit = int(data.get("limit", 50))
-            print(f"[WS Radio] Starting for: {videoId}")
+            logger.info("[WS Radio] Starting for: %s", videoId)
             
             result = await music_service.start_radio(video_id=videoId, limit=limit)
             
             # Send the radio results back to the controller
-            await websocket.send_json({"type": "radio_result", "data": result})
+            await _send(websocket, {"type": "radio_result", "data": result})
             
     except WebSocketDisconnect:
         pass
     except Exception as e:
-        print(f"WS Radio Route Error: {e}")
+        logger.warning("WS Radio Route Error: %s", e)
     finally:
         try:
             await websocket.close()
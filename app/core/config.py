@@ -3,7 +3,51 @@ import os
 # API Keys and Hosts
 RAPIDAPI_KEY = os.environ.get("RAPIDAPI_KEY")
 RAPIDAPI_HOST = os.environ.get("RAPIDAPI_HOST", "spotify-web-api3.p.rapidapi.com")
-RAPIDAPI_URL = f"https://{RAPIDAPI_HOST}/v1/social/spotify/musixmatchsearchlyrics"
+RAPIDAPI_LYRICS_PATH = "/v1/social/spotify/musixmatchsearchlyrics"
+RAPIDAPI_URL = f"https://{RAPIDAPI_HOST}{RAPIDAPI_LYRICS_PATH}"
+# Concurrent RapidAPI calls and requests per second shared by all callers
+RAPIDAPI_CONCURRENCY = int(os.environ.get("RAPIDAPI_CONCURRENCY", "4"))
+RAPIDAPI_RATE = float(os.environ.get("RAPIDAPI_RATE", "5"))
+# Plan quota per hour, and the longest 429 Retry-After we are willing to wait out
+RAPIDAPI_HOURLY_QUOTA = int(os.environ.get("RAPIDAPI_HOURLY_QUOTA", "150"))
+RAPIDAPI_MAX_RETRY_AFTER = float(os.environ.get("RAPIDAPI_MAX_RETRY_AFTER", "10"))
+# LRCLIB (free synced lyrics) raced against RapidAPI; set to "" to disable
+LRCLIB_URL = os.environ.get("LRCLIB_URL", "https://lrclib.net")
+# Concurrent LRCLIB calls and requests per second, so batch lookups don't flood it
+LRCLIB_CONCURRENCY = int(os.environ.get("LRCLIB_CONCURRENCY", "4"))
+LRCLIB_RATE = float(os.environ.get("LRCLIB_RATE", "5"))
+# Seconds LRCLIB gets to answer before RapidAPI (and its quota) is tried as well
+LRCLIB_HEAD_START = float(os.environ.get("LRCLIB_HEAD_START", "1.5"))
+
+# Base for the music_url returned with every track
+MUSIC_URL_PREFIX = "https://music.youtube.com/watch?v="
+
+# Seconds to keep YouTube Music search / watch-playlist responses
+YT_SEARCH_TTL = int(os.environ.get("YT_SEARCH_TTL", "600"))
+YT_WATCH_TTL = int(os.environ.get("YT_WATCH_TTL", "300"))
+# Watch-playlist requests allowed in flight at once
+YT_WATCH_CONCURRENCY = int(os.environ.get("YT_WATCH_CONCURRENCY", "20"))
+# Seconds a caller waits for one watch playlist before counting it as failed
+YT_WATCH_TIMEOUT = float(os.environ.get("YT_WATCH_TIMEOUT", "10"))
+
+# Lyrics barely change, so successful lookups are kept for a day by default
+LYRICS_TTL = int(os.environ.get("LYRICS_TTL", "86400"))
+LYRICS_CACHE_SIZE = int(os.environ.get("LYRICS_CACHE_SIZE", "4096"))
+
+# Worker threads for blocking ytmusicapi calls (loop default executor)
+YT_POOL_SIZE = int(os.environ.get("YT_POOL_SIZE", "64"))
+# Seconds before a single YouTube Music HTTP request gives up (connect and read)
+YT_TIMEOUT = float(os.environ.get("YT_TIMEOUT", "15"))
+
+# Saved recommender database, reused on startup while younger than MUSIC_DB_TTL seconds
+MUSIC_DB_PATH = os.environ.get("MUSIC_DB_PATH", "cache/music_db.json.gz")
+MUSIC_DB_TTL = int(os.environ.get("MUSIC_DB_TTL", "86400"))
+
+# Optional seed for playlist shuffling (handy for reproducible ordering)
+SHUFFLE_SEED = os.environ.get("SHUFFLE_SEED")
+
+# Level for the app's loggers (DEBUG shows per-heartbeat player sync)
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
 
 # CORS Origins
 ORIGINS = [
@@ -0,0 +1,31 @@
+import queue
+import logging
+import logging.handlers
+from typing import Optional
+from .config import LOG_LEVEL
+
+# Records are queued by request handlers and written to stderr by a background
+# thread, so a slow terminal or pipe never stalls the event loop.
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def start_logging():
+    """Route the `app` logger through a queue drained by a listener thread."""
+    global _listener
+    if _listener is not None:
+        return
+    log_queue: queue.Queue = queue.Queue(-1)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger = logging.getLogger("app")
+    logger.setLevel(LOG_LEVEL)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.propagate = False
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+
+def stop_logging():
+    """Flush pending records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,9 +1,32 @@
 import time
-from typing import List, Dict, Any
+import asyncio
+from cachetools import TTLCache
+from typing import List, Dict, Any, Tuple
+from .config import YT_SEARCH_TTL, YT_WATCH_TTL, LYRICS_TTL, LYRICS_CACHE_SIZE
 
 # Application State
 server_start_time: float = time.time()
 out_tracks: List[Dict[str, Any]] = []
 default_context: Dict[str, Any] = {"recLimit": 30, "maxVol": 100, "isMuted": False}
+# title -> videoId for out_tracks, rebuilt whenever the playlist is published
+out_track_ids: Dict[str, str] = {}
 next_song_dt: Dict[str, Any] = {"title": None, "videoId": None, "timestamp": 20}
-RESULT_CACHE: Dict[str, Any] = {}
+# Bumped whenever a search/radio rebuild starts; only the newest rebuild may publish
+playlist_generation: int = 0
+# Generation of the playlist currently held by out_tracks/default_context
+published_generation: int = 0
+# Every rebuilt playlist by generation, so /track/{idx}/ can index the list a client actually saw
+PLAYLISTS: TTLCache = TTLCache(maxsize=1024, ttl=1800)
+# YouTube Music responses, keyed on call arguments
+SEARCH_CACHE: TTLCache = TTLCache(maxsize=2048, ttl=YT_SEARCH_TTL)
+WATCH_CACHE: TTLCache = TTLCache(maxsize=2048, ttl=YT_WATCH_TTL)
+# Last good watch playlist per call, served while YouTube Music is failing
+WATCH_STALE: TTLCache = TTLCache(maxsize=2048, ttl=86400)
+# Radio seed -> {"audio": id, "video": id} official-version resolution (stable, so kept a day)
+SEED_CACHE: TTLCache = TTLCache(maxsize=2048, ttl=86400)
+# Successful lyric lookups by normalized (title, artist), filled by /lyrics/, /track/{idx}/ and its prefetch
+LYRICS_CACHE: TTLCache = TTLCache(maxsize=LYRICS_CACHE_SIZE, ttl=LYRICS_TTL)
+# Formatted /charts/ payloads per country
+CHARTS_CACHE: TTLCache = TTLCache(maxsize=32, ttl=60)
+# Upstream fetches currently running, shared by identical concurrent callers
+INFLIGHT: Dict[Tuple, asyncio.Future] = {}
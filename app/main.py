@@ -1,10 +1,45 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from .api import endpoints, websocket_routes
-from .core.config import ORIGINS
+from .core import state
+from .core.log import start_logging, stop_logging
+from .core.config import ORIGINS, YT_POOL_SIZE
+from .services.music_service import music_service
+from .services.connection_manager import manager
+from .utils.helpers import ORJSONResponse
 
-app = FastAPI(title="YTMusic -> Lyrics FastAPI", version="2.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background work on startup and release upstream connections on shutdown."""
+    start_logging()
+    state.server_start_time = time.time()
+    # The stock default executor tops out at min(32, cpu+4) threads, which queues
+    # concurrent ytmusicapi calls; give run_in_executor/to_thread a bigger pool.
+    executor = ThreadPoolExecutor(max_workers=YT_POOL_SIZE, thread_name_prefix="yt")
+    asyncio.get_running_loop().set_default_executor(executor)
+    await music_service.initialize()
+    manager.start_vol_pump()
+    yield
+    await manager.stop_vol_pump()
+    await music_service.aclose()
+    executor.shutdown(wait=False)
+    stop_logging()
+
+
+# Route return values (track lists, lyrics) are serialized with orjson
+app = FastAPI(
+    title="YTMusic -> Lyrics FastAPI",
+    version="2.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,6 +49,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Track lists and lyrics compress well; level 5 keeps CPU cost below the wire savings
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 app.include_router(endpoints.router)
 app.include_router(websocket_routes.router)
 
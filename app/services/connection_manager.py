@@ -1,37 +1,113 @@
-from typing import List
+import logging
+from typing import List, Dict, Optional, Set
 from fastapi import WebSocket
-import json
+import asyncio
+import contextlib
+import orjson
 from ..utils.helpers import generate_qr_base64
 
+logger = logging.getLogger(__name__)
+
+# Per-send timeout so a stalled client cannot hold up its writer forever
+SEND_TIMEOUT = 2.0
+# Pending messages allowed per client before it is treated as too slow
+OUTBOX_SIZE = 64
+# Most volume broadcasts per second from /ws/vol/, however fast the slider sends
+VOL_RATE_HZ = 30
+
+class ClientOutbox:
+    """Pending outbound frames for one client.
+    Volume updates are idempotent, so only the newest one is kept."""
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=OUTBOX_SIZE)
+        self.latest_vol: Optional[str] = None
+        self.ready = asyncio.Event()
+
+    def put(self, payload: str, msg_type: str = None):
+        if msg_type == "vol":
+            self.latest_vol = payload
+        else:
+            self.queue.put_nowait(payload)
+        self.ready.set()
+
 class DJConnectionManager:
     def __init__(self):
-        # All connected clients
-        self.all_connections: List[WebSocket] = []
+        # All connected clients (sets: O(1) connect/disconnect)
+        self.all_connections: Set[WebSocket] = set()
         # Clients identified as "player" (the main DJ screen)
-        self.player_connections: List[WebSocket] = []
+        self.player_connections: Set[WebSocket] = set()
         # Clients identified as "controller" (phone remotes)
-        self.controller_connections: List[WebSocket] = []
+        self.controller_connections: Set[WebSocket] = set()
+        # Outbound queue and writer task per client
+        self.outboxes: Dict[WebSocket, ClientOutbox] = {}
+        self.writers: Dict[WebSocket, asyncio.Task] = {}
+        # Newest /ws/vol/ frame waiting for the volume pump
+        self.latest_vol: Optional[str] = None
+        self.vol_event = asyncio.Event()
+        self.vol_pump: Optional[asyncio.Task] = None
+        # Fire-and-forget tasks, referenced until they finish
+        self.background: Set[asyncio.Task] = set()
 
     async def connect(self, websocket: WebSocket, role: str = "controller"):
         await websocket.accept()
-        self.all_connections.append(websocket)
+        self.all_connections.add(websocket)
         if role == "player":
-            self.player_connections.append(websocket)
+            self.player_connections.add(websocket)
         else:
-            self.controller_connections.append(websocket)
-        print(f"New {role} connected. Total: {len(self.all_connections)}")
+            self.controller_connections.add(websocket)
+        outbox = ClientOutbox()
+        self.outboxes[websocket] = outbox
+        self.writers[websocket] = asyncio.create_task(self._writer_loop(websocket, outbox))
+        logger.info("New %s connected. Total: %d", role, len(self.all_connections))
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.all_connections:
-            self.all_connections.remove(websocket)
-        if websocket in self.player_connections:
-            self.player_connections.remove(websocket)
-        if websocket in self.controller_connections:
-            self.controller_connections.remove(websocket)
+        self.all_connections.discard(websocket)
+        self.player_connections.discard(websocket)
+        self.controller_connections.discard(websocket)
+        self.outboxes.pop(websocket, None)
+        writer = self.writers.pop(websocket, None)
+        if writer and writer is not asyncio.current_task():
+            writer.cancel()
+
+    async def _writer_loop(self, websocket: WebSocket, outbox: ClientOutbox):
+        """Drains a client's outbox so slow sockets never block the broadcaster."""
+        try:
+            while True:
+                await outbox.ready.wait()
+                outbox.ready.clear()
+                # Ordered messages first, then the newest volume (if any)
+                while not outbox.queue.empty():
+                    await self._send(websocket, outbox.queue.get_nowait())
+                if outbox.latest_vol is not None:
+                    payload, outbox.latest_vol = outbox.latest_vol, None
+                    await self._send(websocket, payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.disconnect(websocket)
+            await self._close(websocket)
+
+    async def _send(self, websocket: WebSocket, payload: str):
+        await asyncio.wait_for(websocket.send_text(payload), timeout=SEND_TIMEOUT)
+
+    async def _close(self, websocket: WebSocket):
+        """Best-effort close of a socket that has already been dropped."""
+        with contextlib.suppress(Exception):
+            await asyncio.wait_for(websocket.close(), timeout=SEND_TIMEOUT)
 
     async def broadcast(self, message: dict, sender: WebSocket = None, target_role: str = None):
         """
         Broadcasts a message to a specific role or everyone.
+        The payload is only queued here; each client's writer task does the actual send,
+        so awaiting this never waits on a client's network.
+        """
+        # Encode once, queue the same text frame for every client
+        payload = orjson.dumps(message).decode()
+        await self.broadcast_text(payload, sender=sender, target_role=target_role, msg_type=message.get("type"))
+
+    async def broadcast_text(self, payload: str, sender: WebSocket = None, target_role: str = None, msg_type: str = None):
+        """
+        Broadcasts an already-encoded text frame. `msg_type` lets volume frames coalesce.
         """
         targets = self.all_connections
         if target_role == "player":
@@ -39,13 +115,55 @@ class DJConnectionManager:
         elif target_role == "controller":
             targets = self.controller_connections
 
+        dropped = []
         for connection in list(targets):
-            if connection == sender:
+            if connection is sender:
+                continue
+            outbox = self.outboxes.get(connection)
+            if outbox is None:
                 continue
             try:
-                await connection.send_json(message)
-            except Exception:
+                outbox.put(payload, msg_type)
+            except asyncio.QueueFull:
+                # Client can't keep up, drop it instead of buffering forever
                 self.disconnect(connection)
+                dropped.append(connection)
+
+        # Close dropped sockets together in the background so the caller
+        # (often an HTTP request) never waits on network I/O here
+        if dropped:
+            task = asyncio.create_task(self._close_all(dropped))
+            self.background.add(task)
+            task.add_done_callback(self.background.discard)
+
+    async def _close_all(self, websockets: List[WebSocket]):
+        await asyncio.gather(*(self._close(c) for c in websockets))
+
+    def publish_vol(self, payload: str):
+        """Record the newest volume frame; the pump broadcasts it on its next tick."""
+        self.latest_vol = payload
+        self.vol_event.set()
+
+    async def _vol_pump(self):
+        """Broadcasts at most VOL_RATE_HZ volume frames per second, always the newest."""
+        while True:
+            await self.vol_event.wait()
+            self.vol_event.clear()
+            payload, self.latest_vol = self.latest_vol, None
+            if payload is not None:
+                await self.broadcast_text(payload, msg_type="vol")
+            await asyncio.sleep(1 / VOL_RATE_HZ)
+
+    def start_vol_pump(self):
+        if self.vol_pump is None or self.vol_pump.done():
+            self.vol_pump = asyncio.create_task(self._vol_pump())
+
+    async def stop_vol_pump(self):
+        if self.vol_pump is not None:
+            self.vol_pump.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.vol_pump
+            self.vol_pump = None
 
 class PlayerBroadcaster:
     """Explicit broadcaster for the main Player App (Display)"""
@@ -1,32 +1,202 @@
+import logging
+import re
 import time
-import requests
+import httpx
+import orjson
 import asyncio
+import inspect
 import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from typing import Optional, List, Dict, Any
-from concurrent.futures import ThreadPoolExecutor
 
 from ytmusicapi import YTMusic
-from ..core.config import RAPIDAPI_KEY, RAPIDAPI_HOST, RAPIDAPI_URL
-from ..utils.helpers import detect_verses
+from cachetools import cached
+from cachetools.keys import hashkey
+from ..core.config import RAPIDAPI_KEY, RAPIDAPI_HOST, RAPIDAPI_LYRICS_PATH, RAPIDAPI_CONCURRENCY, RAPIDAPI_RATE, RAPIDAPI_HOURLY_QUOTA, RAPIDAPI_MAX_RETRY_AFTER, LRCLIB_URL, LRCLIB_CONCURRENCY, LRCLIB_RATE, LRCLIB_HEAD_START, SHUFFLE_SEED, MUSIC_URL_PREFIX, YT_POOL_SIZE, YT_TIMEOUT, YT_WATCH_CONCURRENCY, YT_WATCH_TIMEOUT, MUSIC_DB_PATH, MUSIC_DB_TTL
+from ..core.state import SEARCH_CACHE, WATCH_CACHE, WATCH_STALE, LYRICS_CACHE, SEED_CACHE, INFLIGHT
+from ..utils.helpers import detect_verses, index_video_ids, build_requests_session, AsyncRateLimiter, CircuitBreaker, CircuitOpenError
 from .recommender_system import AsyncIndianMusicRecommender
 
+logger = logging.getLogger(__name__)
+
+# (label, substrings) checked against the lowercased title, in display order.
+# Patterns that contain another pattern of the same label are left out.
+LABEL_RULES = (
+    ("Official", ("official video", "official music video", "official audio")),
+    ("Remix", ("remix", "re-mix", "rmx")),
+    ("Slowed", ("slowed",)),
+    ("Live", ("live",)),
+    ("Lyrics", ("lyrical", "lyrics")),
+    ("Cover", ("cover",)),
+    ("Mashup", ("mashup",)),
+)
+_LABEL_BY_PATTERN = {p: label for label, patterns in LABEL_RULES for p in patterns}
+# One scanner for every pattern; the lookahead reports overlapping matches too,
+# so a single pass over the title gives the same result as per-pattern `in` checks.
+_LABEL_SCANNER = re.compile(
+    "(?=(" + "|".join(re.escape(p) for p in sorted(_LABEL_BY_PATTERN, key=len, reverse=True)) + "))"
+)
+
+# YTMusic calls run in executor threads, so cache access is locked
+_yt_cache_lock = threading.RLock()
+
+# Dedicated generator for queue shuffling, seedable via SHUFFLE_SEED
+RNG = random.Random(SHUFFLE_SEED)
+
+def _method_key(self, *args, **kwargs):
+    """Cache key for a bound method, ignoring `self` (the service is a singleton)."""
+    return hashkey(*args, **kwargs)
+
+def _retry_after(value: Optional[str], default: float = 1.0) -> float:
+    """Seconds from a Retry-After header (delta-seconds form), capped by RAPIDAPI_MAX_RETRY_AFTER."""
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        seconds = default
+    return min(max(seconds, 0.0), RAPIDAPI_MAX_RETRY_AFTER)
+
+def _lrc_lines(data) -> list:
+    """RapidAPI's lyrics payload as LRC lines, the shape LRCLIB results have too."""
+    if isinstance(data, dict):
+        data = data.get("lyrics") or data.get("syncedLyrics")
+    if isinstance(data, str):
+        return data.splitlines()
+    if isinstance(data, list):
+        return [line for line in data if isinstance(line, str)]
+    return []
+
+def lyrics_key(title: str, artist: Optional[str]) -> tuple:
+    """Cache key for a lyric lookup; case and surrounding whitespace don't matter."""
+    return ((title or "").strip().lower(), (artist or "").strip().lower())
+
 class MusicService:
     def __init__(self):
         # Initialize YTMusic (anonymous). Keep a single instance.
-        self.yt = YTMusic()
-        self.recommender = AsyncIndianMusicRecommender()
+        # One pooled session for every ytmusicapi call, sized for the YT executor
+        self.yt_session = build_requests_session(pool_maxsize=YT_POOL_SIZE, timeout=YT_TIMEOUT)
+        self.yt = YTMusic(requests_session=self.yt_session)
+        self.recommender = AsyncIndianMusicRecommender(yt=self.yt)
+        # Watch playlists are the slowest YT call: cap them and stop calling while they fail
+        self.watch_slots = threading.BoundedSemaphore(YT_WATCH_CONCURRENCY)
+        # Calls run on their own threads so a hung one can be abandoned after YT_WATCH_TIMEOUT
+        self.watch_pool = ThreadPoolExecutor(YT_WATCH_CONCURRENCY, thread_name_prefix="yt-watch")
+        self.watch_breaker = CircuitBreaker(window=20, min_calls=10, failure_ratio=0.5, slow_call=5.0, cooldown=30.0)
         self.out_tracks = [] # Could be stateful per session if multiple users, but app.py implies single instance global state for now
+        # Shared async HTTP client for RapidAPI, plus a concurrency cap and rate limit.
+        # Auth headers live on the client so every call reuses the same pooled connection.
+        rapidapi_headers = {"x-rapidapi-host": RAPIDAPI_HOST}
+        if RAPIDAPI_KEY:
+            rapidapi_headers["x-rapidapi-key"] = RAPIDAPI_KEY
+        self.http = httpx.AsyncClient(
+            base_url=f"https://{RAPIDAPI_HOST}",
+            headers=rapidapi_headers,
+            timeout=15,
+            # httpx ignores client-level http2/limits once a transport is given,
+            # so they must be set on the transport itself
+            transport=httpx.AsyncHTTPTransport(
+                retries=2,
+                http2=True,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=32)
+            )
+        )
+        self.rapidapi_sem = asyncio.Semaphore(RAPIDAPI_CONCURRENCY)
+        self.rapidapi_limiter = AsyncRateLimiter(RAPIDAPI_RATE, 1.0)
+        self.rapidapi_quota = AsyncRateLimiter(RAPIDAPI_HOURLY_QUOTA, 3600.0)
+        # Separate client for LRCLIB so RapidAPI credentials never leave for another host
+        self.lrclib = httpx.AsyncClient(
+            base_url=LRCLIB_URL,
+            headers={"User-Agent": "PythonDJ (https://github.com/rahulsingh9878/PythonDJ)"},
+            timeout=10,
+            transport=httpx.AsyncHTTPTransport(retries=2)
+        ) if LRCLIB_URL else None
+        self.lrclib_sem = asyncio.Semaphore(LRCLIB_CONCURRENCY)
+        self.lrclib_limiter = AsyncRateLimiter(LRCLIB_RATE, 1.0)
+        # Running lyric prefetches, referenced until they finish
+        self.prefetches = set()
+        # Startup database load/build, referenced so it isn't garbage-collected mid-run
+        self.db_task = None
 
     async def initialize(self):
-        """Start building the music database in the background on app startup."""
-        asyncio.create_task(self.recommender.build_all_collections())
+        """Load (or else build) the music database in the background on app startup."""
+        self.db_task = asyncio.create_task(self.recommender.load_or_build(MUSIC_DB_PATH, MUSIC_DB_TTL))
+
+    async def aclose(self):
+        """Release pooled upstream connections on app shutdown."""
+        await self.http.aclose()
+        if self.lrclib is not None:
+            await self.lrclib.aclose()
+        self.watch_pool.shutdown(wait=False, cancel_futures=True)
+        self.yt_session.close()
+        if self.db_task is not None:
+            self.db_task.cancel()
+        await self.recommender.aclose()
+
+    async def single_flight(self, key: tuple, fn, *args):
+        """
+        Run a fetch once for concurrent callers that ask for the same key.
+        Blocking functions run in a worker thread; coroutine functions are awaited.
+        """
+        task = INFLIGHT.get(key)
+        if task is None:
+            if inspect.iscoroutinefunction(fn):
+                task = asyncio.ensure_future(fn(*args))
+            else:
+                task = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+            INFLIGHT[key] = task
+            task.add_done_callback(lambda t: self._single_flight_done(key, t))
+        # Every caller (the first one included) waits through a shield, so a caller
+        # that goes away never cancels the shared fetch for the others
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _single_flight_done(key, task):
+        if INFLIGHT.get(key) is task:
+            INFLIGHT.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # mark retrieved when nobody is left waiting
 
     def get_watch_playlist(self, videoId, limit=20, radio=False):
-        return self.yt.get_watch_playlist(videoId=videoId, limit=limit, radio=radio)
+        """
+        Cached watch playlist. If YouTube Music fails, or the breaker is open after
+        repeated failures, the last good copy for the same call is served instead.
+        """
+        try:
+            return self._fetch_watch_playlist(videoId, limit, radio)
+        except Exception as e:
+            with _yt_cache_lock:
+                stale = WATCH_STALE.get((videoId, limit, radio))
+            if stale is None:
+                raise
+            logger.warning("Serving stale watch playlist for %s: %s", videoId, e)
+            return stale
+
+    @cached(WATCH_CACHE, key=_method_key, lock=_yt_cache_lock)
+    def _fetch_watch_playlist(self, videoId, limit, radio):
+        allowed, probe = self.watch_breaker.allow()
+        if not allowed:
+            raise CircuitOpenError("YouTube Music watch playlists are failing; circuit open")
+        with self.watch_slots:
+            start = time.monotonic()
+            try:
+                future = self.watch_pool.submit(self.yt.get_watch_playlist, videoId=videoId, limit=limit, radio=radio)
+                try:
+                    result = future.result(timeout=YT_WATCH_TIMEOUT)
+                except FutureTimeoutError:
+                    # Give the slot back; the session timeout ends the stuck request eventually
+                    raise TimeoutError(f"watch playlist for {videoId} took over {YT_WATCH_TIMEOUT:g}s")
+            except Exception:
+                self.watch_breaker.record(False, time.monotonic() - start, probe)
+                raise
+        self.watch_breaker.record(True, time.monotonic() - start, probe)
+        with _yt_cache_lock:
+            WATCH_STALE[(videoId, limit, radio)] = result
+        return result
         
     def get_song(self, videoId):
         return self.yt.get_song(videoId)
 
+    @cached(SEARCH_CACHE, key=_method_key, lock=_yt_cache_lock)
     def search(self, query, filter_type="songs", limit=3):
         return self.yt.search(query, filter=filter_type, limit=limit)
 
@@ -35,7 +205,7 @@ class MusicService:
         try:
              return self.yt.get_search_suggestions(query)
         except Exception as e:
-            print(f"Error fetching suggestions: {e}")
+            logger.warning("Error fetching suggestions: %s", e)
             return []
 
     def process_results(self, results, result_type, filter_title=None):
@@ -61,22 +231,10 @@ class MusicService:
 
             # --- Label Detection ---
             title_lower = title.lower()
-            labels = []
-            
-            if any(x in title_lower for x in ["official video", "official music video", "(official video)", "official audio"]):
-                labels.append("Official")
-            if any(x in title_lower for x in ["remix", "re-mix", "rmx"]):
-                labels.append("Remix")
-            if any(x in title_lower for x in ["slowed", "slowed + reverb", "slowed and reverb"]):
-                labels.append("Slowed")
-            if "live" in title_lower and "deliver" not in title_lower:
-                labels.append("Live")
-            if any(x in title_lower for x in ["lyrical", "lyrics"]):
-                labels.append("Lyrics")
-            if "cover" in title_lower:
-                labels.append("Cover")
-            if "mashup" in title_lower:
-                labels.append("Mashup")
+            found = {_LABEL_BY_PATTERN[m.group(1)] for m in _LABEL_SCANNER.finditer(title_lower)}
+            labels = [label for label, _ in LABEL_RULES if label in found]
+            if "Live" in labels and "deliver" in title_lower:
+                labels.remove("Live")
             
             # --- Sorting Weight ---
             weight = 0
@@ -91,32 +249,36 @@ class MusicService:
                     thumbnails = thumbnails[0]
                 
                 if isinstance(thumbnails, list) and len(thumbnails) > 0:
-                    try:
-                        best_thumb = max(thumbnails, key=lambda x: int(x.get('width', 0)) * int(x.get('height', 0)))
-                        thumbnail_url = best_thumb.get("url", "")
-                    except:
-                        thumbnail_url = thumbnails[0].get("url", "")
+                    # YTMusic lists thumbnails smallest first, so the last one is the best.
+                    # Only scan the whole list when the sizes can't be trusted.
+                    best_thumb = thumbnails[-1]
+                    if "width" not in best_thumb or "height" not in best_thumb:
+                        try:
+                            best_thumb = max(thumbnails, key=lambda x: int(x.get('width', 0)) * int(x.get('height', 0)))
+                        except:
+                            best_thumb = thumbnails[0]
+                    thumbnail_url = best_thumb.get("url", "")
                 elif isinstance(thumbnails, dict):
                     thumbnail_url = thumbnails.get("url", "")
 
             if thumbnail_url and "googleusercontent.com" in thumbnail_url:
-                if "=" in thumbnail_url:
-                    base_url = thumbnail_url.split("=")[0]
-                    thumbnail_url = f"{base_url}=w512-h512-l90-rj"
-                elif "-s" in thumbnail_url:
-                    base_name = thumbnail_url.split("-s")[0]
-                    thumbnail_url = f"{base_name}-s512-c"
+                # partition() finds the separator once and never builds a list
+                base_url, sep, _ = thumbnail_url.partition("=")
+                if sep:
+                    thumbnail_url = base_url + "=w512-h512-l90-rj"
+                else:
+                    base_name, sep, _ = thumbnail_url.partition("-s")
+                    if sep:
+                        thumbnail_url = base_name + "-s512-c"
             
             if not thumbnail_url and video_id:
                 thumbnail_url = f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"
             
-            url = f"https://music.youtube.com/watch?v={video_id}"
-            
             processed.append({
                 "title": title,
                 "artist": artist_name,
                 "videoId": video_id,
-                "music_url": url, 
+                "music_url": MUSIC_URL_PREFIX + video_id,
                 "thumbnail": thumbnail_url,
                 "type": result_type,
                 "labels": labels,
@@ -127,16 +289,47 @@ class MusicService:
         processed.sort(key=lambda x: x['weight'], reverse=True)
         return processed
 
-    def fetch_lyrics(self, title: str, artist: str = None, browseId: str = None, delay: float = 0.5) -> dict:
+    async def fetch_lyrics(self, title: str, artist: str = None, browseId: str = None,
+                           prefetch: bool = False) -> dict:
         """
-        Fetch lyrics, trying YouTube Music first (free/official), then falling back to RapidAPI.
+        Fetch lyrics, serving recent successful lookups (including prefetches) from LYRICS_CACHE.
+        Prefetches skip RapidAPI so speculative lookups never spend its hourly quota.
+        """
+        key = lyrics_key(title, artist)
+        cached_response = LYRICS_CACHE.get(key)
+        if cached_response is not None:
+            return cached_response
+        # Identical lookups in flight share one call; prefetches get their own key so a
+        # user's click never inherits a lookup that left RapidAPI out
+        flight = ("lyrics", prefetch) + key
+        response = await self.single_flight(flight, self._fetch_lyrics_upstream, title, artist, browseId, not prefetch)
+        if response.get("data"):
+            LYRICS_CACHE[key] = response
+        return response
+
+    def prefetch_lyrics(self, tracks: list):
+        """Warm LYRICS_CACHE for tracks the user is likely to pick next, in the background."""
+        for t in tracks:
+            title = t.get("title", "")
+            artist = t.get("artist", "")
+            if not title or lyrics_key(title, artist) in LYRICS_CACHE:
+                continue
+            task = asyncio.create_task(self.fetch_lyrics(title, artist, browseId=t.get("browseId"), prefetch=True))
+            self.prefetches.add(task)
+            task.add_done_callback(self.prefetches.discard)
+
+    async def _fetch_lyrics_upstream(self, title: str, artist: str = None, browseId: str = None,
+                                     rapidapi: bool = True) -> dict:
+        """
+        Fetch lyrics, trying YouTube Music first (free/official), then LRCLIB and RapidAPI.
+        Both of those return `data` as a list of LRC lines.
         """
 
         # 1. Try YouTube Music Lyrics (Official & Free)
         if browseId:
             try:
-                print(f"Fetching YT lyrics for browseId: {browseId}")
-                lyrics_data = self.yt.get_lyrics(browseId)
+                logger.info("Fetching YT lyrics for browseId: %s", browseId)
+                lyrics_data = await asyncio.to_thread(self.yt.get_lyrics, browseId)
                 if lyrics_data and "lyrics" in lyrics_data:
                     return {
                         "status": 200, 
@@ -147,39 +340,132 @@ class MusicService:
                         }
                     }
             except Exception as e:
-                print(f"YT lyrics fetch failed: {e}")
-
-        # 2. Fallback to RapidAPI (Musixmatch)
-        if not RAPIDAPI_KEY:
-            return {"status": 404, "error": "No lyrics found (YT failed, no RapidAPI key)"}
-
+                logger.warning("YT lyrics fetch failed: %s", e)
+
+        # 2. LRCLIB (free) gets a head start; RapidAPI's hourly quota is only spent
+        # when LRCLIB misses or is slow, and then the first source with lyrics wins
+        use_rapidapi = bool(RAPIDAPI_KEY) and rapidapi
+        if self.lrclib is None and not use_rapidapi:
+            return {"status": 404, "error": "No lyrics found (YT failed, no other lyrics source)"}
+
+        sources = {}
+        if self.lrclib is not None:
+            sources[asyncio.ensure_future(self._fetch_lrclib(title, artist))] = "LRCLIB"
+        pending = set(sources)
+        failures = {}
+        try:
+            if use_rapidapi:
+                if pending:
+                    done, pending = await asyncio.wait(pending, timeout=LRCLIB_HEAD_START)
+                    for task in done:
+                        result = task.result()
+                        if result.get("data"):
+                            return result
+                        failures[sources[task]] = result
+                task = asyncio.ensure_future(self._fetch_rapidapi(title, artist))
+                sources[task] = "RapidAPI"
+                pending.add(task)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result.get("data"):
+                        return result
+                    failures[sources[task]] = result
+        finally:
+            for task in pending:
+                task.cancel()
+        # Nobody had lyrics: report RapidAPI's failure if it ran, since callers map its status
+        return failures.get("RapidAPI") or failures["LRCLIB"]
+
+    async def _fetch_rapidapi(self, title: str, artist: str = None) -> dict:
+        """Musixmatch lyrics via RapidAPI, within the shared quota and rate limits."""
         params = {"terms": title}
         if artist:
             params["artist"] = artist
 
-        headers = {
-            "x-rapidapi-key": RAPIDAPI_KEY,
-            "x-rapidapi-host": RAPIDAPI_HOST
-        }
-
-        time.sleep(delay)
-
         try:
-            print(f"Falling back to RapidAPI for: {title}")
-            resp = requests.get(RAPIDAPI_URL, headers=headers, params=params, timeout=15)
+            logger.info("Falling back to RapidAPI for: %s", title)
+            for attempt in range(2):
+                # Check the hourly quota before queueing for a slot, and fail fast when
+                # it is spent: the next token can be minutes away
+                if not self.rapidapi_quota.try_acquire():
+                    logger.warning("RapidAPI hourly quota exhausted, skipping: %s", title)
+                    return {"status": 429, "error": "RapidAPI hourly quota exhausted"}
+                async with self.rapidapi_sem, self.rapidapi_limiter:
+                    resp = await self.http.get(RAPIDAPI_LYRICS_PATH, params=params)
+                if resp.status_code != 429 or attempt:
+                    break
+                # Throttled: wait as long as RapidAPI asks (within reason), then retry once
+                await asyncio.sleep(_retry_after(resp.headers.get("Retry-After")))
             resp.raise_for_status()
-            data = resp.json()
+            data = orjson.loads(resp.content)
+            lines = _lrc_lines(data.get("data", data))
+            if not lines:
+                return {"status": 404, "error": "No synced lyrics on RapidAPI"}
             return {
                 "status": data.get("status", resp.status_code), 
-                "data": data.get("data", data),
+                "data": lines,
                 "source": "RapidAPI"
             }
-        except requests.HTTPError as e:
-            print(f"RapidAPI failed: {e}") 
+        except httpx.HTTPStatusError as e:
+            logger.warning("RapidAPI failed: %s", e)
             return {"status": 502, "error": str(e)}
         except Exception as e:
             return {"status": 500, "error": str(e)}
 
+    async def _fetch_lrclib(self, title: str, artist: str = None) -> dict:
+        """Synced lyrics from LRCLIB (free, no key) as LRC lines, within its own limits."""
+        params = {"track_name": title}
+        if artist:
+            params["artist_name"] = artist
+
+        try:
+            logger.info("Trying LRCLIB for: %s", title)
+            async with self.lrclib_sem, self.lrclib_limiter:
+                resp = await self.lrclib.get("/api/get", params=params)
+            if resp.status_code == 404:
+                return {"status": 404, "error": "No lyrics found on LRCLIB"}
+            resp.raise_for_status()
+            synced = orjson.loads(resp.content).get("syncedLyrics")
+            if not synced:
+                return {"status": 404, "error": "No synced lyrics on LRCLIB"}
+            return {"status": 200, "data": synced.splitlines(), "source": "LRCLIB"}
+        except httpx.HTTPStatusError as e:
+            logger.warning("LRCLIB failed: %s", e)
+            return {"status": 502, "error": str(e)}
+        except Exception as e:
+            return {"status": 500, "error": str(e)}
+
+    def begin_playlist_update(self) -> int:
+        """Claim a generation number for a playlist rebuild that is about to start."""
+        from ..core import state
+        state.playlist_generation += 1
+        return state.playlist_generation
+
+    def commit_playlist(self, generation: int, tracks: list, context: dict) -> bool:
+        """
+        Publish a rebuilt playlist to the shared state, unless a newer rebuild
+        started while this one was waiting on upstream calls.
+        """
+        from ..core import state
+        state.PLAYLISTS[generation] = tracks
+        context["playlist_id"] = generation
+        if generation != state.playlist_generation:
+            return False
+        state.out_tracks.clear()
+        state.out_tracks.extend(tracks)
+        state.out_track_ids = index_video_ids(tracks)
+        state.default_context.clear()
+        state.default_context.update({k: v for k, v in context.items() if k != "request"})
+        state.published_generation = generation
+        return True
+
+    def is_published(self, context: dict) -> bool:
+        """True while `context` is the playlist last published by commit_playlist."""
+        from ..core import state
+        return context.get("playlist_id") == state.published_generation
+
     async def play_and_populate(self, video_id: str, title: str, limit: int = 30, maxVol: int = 100, music_type: str = "songs"):
         """
         New Play Flow:
@@ -187,8 +473,6 @@ class MusicService:
         2. Use radio logic (related tracks) to populate the background list.
         """
         from ..services.connection_manager import player_broadcaster, webapp_broadcaster
-        from ..core import state
-        import copy
 
         # 1. Immediate Broadcast (Fast Lane) to Player Only
         play_data = {
@@ -199,12 +483,13 @@ class MusicService:
         await player_broadcaster.send("play", play_data)
 
         # 2. Use Radio Logic to fetch new list
-        radio_result = await self.start_radio(video_id=video_id, limit=limit)
+        generation = self.begin_playlist_update()
+        radio_result = await self.start_radio(video_id=video_id, limit=limit, generation=generation)
         
         # 3. Format context for UI (Merging radio results with current state like volume)
         context = {
             "query": title,
-            "tracks": state.out_tracks,
+            "tracks": radio_result.get("tracks", []),
             "video_tracks": radio_result.get("video_tracks", []),
             "song_tracks": radio_result.get("song_tracks", []),
             "recLimit": limit,
@@ -213,16 +498,15 @@ class MusicService:
         }
 
         # Update global default_context
-        state.default_context.clear()
-        state.default_context.update(copy.deepcopy(context))
+        self.commit_playlist(generation, context["tracks"], context)
         
         return context
 
     async def perform_search(self, query: str, limit: int = 30, nextPlay: bool = False, maxVol: int = 100, music_type: str = "songs", videoId: Optional[str] = None, refresh: bool = False):
         from ..core import state
         from ..services.connection_manager import manager
-        from ..utils.helpers import find_video_id
         
+        generation = self.begin_playlist_update()
         target_id = None
         exclude_title = None
 
@@ -232,7 +516,7 @@ class MusicService:
             query = first.get("title")
             exclude_title = query.lower()
         elif nextPlay:
-            target_id = videoId if videoId else (find_video_id(state.out_tracks, query) if state.out_tracks else None)
+            target_id = videoId if videoId else state.out_track_ids.get(query)
             exclude_title = query.lower()
             
             if target_id:
@@ -243,21 +527,19 @@ class MusicService:
                 }
                 await manager.broadcast({"type": "play", "data": play_data})
 
-        # --- Helper wrappers for ThreadPoolExecutor ---
+        # --- Blocking helpers, run via asyncio.to_thread ---
         def fetch_song_search():
              try: return self.search(query, filter_type="songs", limit=limit)
-             except Exception as e: print(f"Error in song search: {e}"); return []
+             except Exception as e: logger.warning("Error in song search: %s", e); return []
 
         def fetch_video_search():
              try: return self.search(query, filter_type="videos", limit=limit)
-             except Exception as e: print(f"Error in video search: {e}"); return []
+             except Exception as e: logger.warning("Error in video search: %s", e); return []
 
-        loop = asyncio.get_running_loop()
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            song_search_future = executor.submit(fetch_song_search)
-            video_search_future = executor.submit(fetch_video_search)
-            song_search_results = await loop.run_in_executor(None, song_search_future.result)
-            video_search_results = await loop.run_in_executor(None, video_search_future.result)
+        song_search_results, video_search_results = await asyncio.gather(
+            self.single_flight(("search", query, "songs", limit), fetch_song_search),
+            self.single_flight(("search", query, "videos", limit), fetch_video_search)
+        )
 
         song_tracks = self.process_results(song_search_results, "song", filter_title=exclude_title)
         video_tracks = self.process_results(video_search_results, "video", filter_title=exclude_title)
@@ -274,12 +556,9 @@ class MusicService:
         for idx, t in enumerate(new_out_tracks):
             t["index"] = idx
 
-        state.out_tracks.clear()
-        state.out_tracks.extend(new_out_tracks)
-
         context = {
             "query": query,
-            "tracks": state.out_tracks,
+            "tracks": new_out_tracks,
             "video_tracks": video_tracks,
             "song_tracks": song_tracks,
             "recLimit": limit,
@@ -287,40 +566,37 @@ class MusicService:
             "music_type": music_type,
         }
 
-        state.default_context.clear()
-        import copy
-        state.default_context.update(copy.deepcopy(context))
+        self.commit_playlist(generation, new_out_tracks, context)
         return context
 
     def reorder_for_selection(self, tracks, tid, q, is_refresh):
         if not tracks: return []
         playing = None
-        others = []
         q_lower = q.lower()
+
+        # Single pass: pull out the selected track and tag every other
+        # track with whether its title matches the query.
+        others = []
+        first_match = None
+        for t in tracks:
+            if tid and t.get('videoId') == tid:
+                playing = t
+                continue
+            is_match = q_lower in t.get('title', '').lower()
+            if is_match and first_match is None:
+                first_match = len(others)
+            others.append((t, is_match))
+
+        if not playing and first_match is not None:
+            playing = others.pop(first_match)[0]
+        elif not playing and others and not is_refresh:
+            playing = others.pop(0)[0]
+
+        matches = [t for t, is_match in others if is_match]
+        non_matches = [t for t, is_match in others if not is_match]
         
-        if tid:
-            for t in tracks:
-                if t.get('videoId') == tid: playing = t
-                else: others.append(t)
-        else: others = tracks
-
-        if not playing and others:
-            for i, t in enumerate(others):
-                if q_lower in t.get('title', '').lower():
-                    playing = others.pop(i)
-                    break
-        
-        if not playing and others and not is_refresh:
-            playing = others.pop(0)
-        
-        matches = []
-        non_matches = []
-        for t in others:
-            if q_lower in t.get('title', '').lower(): matches.append(t)
-            else: non_matches.append(t)
-        
-        random.shuffle(matches)
-        random.shuffle(non_matches)
+        RNG.shuffle(matches)
+        RNG.shuffle(non_matches)
         
         final = []
         if playing and not is_refresh: final.append(playing)
@@ -328,88 +604,110 @@ class MusicService:
         final.extend(matches)
         return final
 
-    async def start_radio(self, video_id: str, limit: int = 50):
+    async def start_radio(self, video_id: str, limit: int = 50, generation: Optional[int] = None):
         """
         Refined Radio Logic: Ensures all results (both audio and video slots) are 
         Official Music Videos for a premium TV experience.
         """
         from ..core import state
-        loop = asyncio.get_running_loop()
+        if generation is None:
+            generation = self.begin_playlist_update()
 
-        def resolve_ids(original_id):
+        async def resolve_ids(original_id):
             """Resolves any ID to its Official Music Video counterpart. Returns {'audio': id, 'video': id}."""
+            cached_ids = SEED_CACHE.get(original_id)
+            if cached_ids is not None:
+                return cached_ids
             res = {"audio": original_id, "video": original_id}
             try:
-                metadata = self.get_song(original_id)
+                metadata = await asyncio.to_thread(self.get_song, original_id)
                 v_details = metadata.get("videoDetails", {})
-                # Search for the video version
+                # Search for the video and audio versions at the same time
                 title = v_details.get("title", "")
                 artist = v_details.get("author", "")
                 vq = f"{title} {artist} official music video"
                 aq = f"{title} {artist} official audio song"
-                video_results = self.search(vq, filter_type="videos", limit=1)
-                audio_results = self.search(aq, filter_type="songs", limit=1)
+                video_results, audio_results = await asyncio.gather(
+                    asyncio.to_thread(self.search, vq, filter_type="videos", limit=1),
+                    asyncio.to_thread(self.search, aq, filter_type="songs", limit=1)
+                )
                 if video_results:
                     res["video"] = video_results[0].get("videoId") or original_id
                 if audio_results:
                     res["audio"] = audio_results[0].get("videoId") or original_id
-            except: pass
+                SEED_CACHE[original_id] = res
+            except Exception: pass
             return res
 
         def fetch_playlist_blocking(vid, lim):
             return self.get_watch_playlist(videoId=vid, limit=lim, radio=True)
 
-        def process_results(raw_list, music_type="video", label_type="Video Mix"):
-            processed = []
-            for t in raw_list:
-                vid = t.get("videoId")
-                if not vid: continue
-                title = t.get("title", "")
-                artists = t.get("artists", [])
-                artist_name = artists[0]["name"] if artists else ""
-                
-                thumbnails = t.get("thumbnail", t.get("thumbnails", []))
+        def radio_thumb(t):
+            thumbnails = t.get("thumbnail") or t.get("thumbnails") or ()
+            if isinstance(thumbnails, list):
+                thumb_url = thumbnails[-1].get("url", "") if thumbnails else ""
+            elif isinstance(thumbnails, dict):
+                thumb_url = thumbnails.get("url", "")
+            else:
                 thumb_url = ""
-                if thumbnails:
-                    if isinstance(thumbnails, list) and len(thumbnails) > 0:
-                        thumb_url = thumbnails[-1].get("url", "")
-                    elif isinstance(thumbnails, dict):
-                        thumb_url = thumbnails.get("url", "")
-                
-                if thumb_url and "googleusercontent.com" in thumb_url:
-                    base = thumb_url.split("=")[0] if "=" in thumb_url else thumb_url.split("-s")[0]
-                    thumb_url = f"{base}=w512-h512-l90-rj"
-                
-                # Label Detection for videos
-                labels = [label_type]
-                title_l = title.lower()
-                if any(x in title_l for x in ["official video", "music video"]): labels.append("Official")
+            if thumb_url and "googleusercontent.com" in thumb_url:
+                base, sep, _ = thumb_url.partition("=")
+                if not sep:
+                    base = thumb_url.partition("-s")[0]
+                thumb_url = base + "=w512-h512-l90-rj"
+            return thumb_url
+
+        def process_results(raw_list, music_type="video", label_type="Video Mix"):
+            prefix = MUSIC_URL_PREFIX
+            official = [label_type, "Official"]
+            plain = [label_type]
 
-                processed.append({
+            def build(t, vid, title):
+                title_l = title.lower()
+                is_official = "official video" in title_l or "music video" in title_l
+                artists = t.get("artists")
+                return {
                     "title": title,
-                    "artist": artist_name,
+                    "artist": artists[0]["name"] if artists else "",
                     "videoId": vid,
-                    "music_url": f"https://music.youtube.com/watch?v={vid}",
-                    "thumbnail": thumb_url,
+                    "music_url": prefix + vid,
+                    "thumbnail": radio_thumb(t),
                     "type": music_type,
-                    "labels": labels,
-                    "weight": 10 if "Official" in labels else 5
-                })
-            return processed
+                    "labels": list(official if is_official else plain),
+                    "weight": 10 if is_official else 5
+                }
 
-        # 1. Resolve seed to video
-        ids = await loop.run_in_executor(None, resolve_ids, video_id)
-        video_seed = ids["video"]
-        audio_seed = ids["audio"]
+            return [build(t, vid, t.get("title", "")) for t in raw_list if (vid := t.get("videoId"))]
 
-        # 2. Fetch Two Parallel Streams
-        async def get_varied_mixes():
-            raw_1 = await loop.run_in_executor(None, fetch_playlist_blocking, video_seed, limit)
-            tracks_1 = raw_1.get("tracks", [])
-            raw_2 = await loop.run_in_executor(None, fetch_playlist_blocking, audio_seed, limit)
-            return tracks_1, raw_2.get("tracks", [])
+        def fetch_mix(seed):
+            return self.single_flight(("radio", seed, limit), fetch_playlist_blocking, seed, limit)
 
-        mix_1, mix_2 = await get_varied_mixes()
+        # 1. Resolve seed to video, while speculatively fetching the playlist for the
+        # original id (resolution often hands it back unchanged)
+        speculative = asyncio.ensure_future(fetch_mix(video_id))
+        ids = await resolve_ids(video_id)
+        video_seed = ids["video"]
+        audio_seed = ids["audio"]
+        if video_id not in (video_seed, audio_seed):
+            speculative.cancel()
+
+        # 2. Fetch Two Parallel Streams (identical seeds share one request)
+        results = await asyncio.gather(
+            speculative if video_seed == video_id else fetch_mix(video_seed),
+            speculative if audio_seed == video_id else fetch_mix(audio_seed),
+            return_exceptions=True
+        )
+        # One failed stream still leaves a usable radio, but never publish an empty
+        # playlist over the current one when every fetch failed
+        if all(isinstance(raw, BaseException) for raw in results):
+            raise results[0]
+        mixes = []
+        for raw in results:
+            if isinstance(raw, BaseException):
+                logger.warning("Radio playlist fetch failed: %s", raw)
+                raw = {}
+            mixes.append(raw.get("tracks", []))
+        mix_1, mix_2 = mixes
         
         # 3. Use separate processors for Songs and Videos
         video_tracks = process_results(mix_1, "video", "Video Mix")
@@ -418,15 +716,12 @@ class MusicService:
         # Update global operational state
         final_list = song_tracks + video_tracks
         for i, t in enumerate(final_list): t["index"] = i
-        
-        state.out_tracks.clear()
-        state.out_tracks.extend(final_list)
 
         # Build context to match Search Route structure
         current_max_vol = state.default_context.get("maxVol", 100)
         context = {
             "query": "Radio Mix", 
-            "tracks": state.out_tracks,
+            "tracks": final_list,
             "song_tracks": song_tracks,
             "video_tracks": video_tracks,
             "recLimit": limit,
@@ -435,9 +730,7 @@ class MusicService:
         }
         
         # Sync Global Context (so all controllers see the new list)
-        import copy
-        state.default_context.clear()
-        state.default_context.update(copy.deepcopy(context))
+        self.commit_playlist(generation, final_list, context)
 
         return context
 
@@ -1,10 +1,17 @@
 from ytmusicapi import YTMusic
-import json
+import os
+import gzip
+import time
+import functools
+import orjson
 import random
 import asyncio
+import logging
 import concurrent.futures
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+logger = logging.getLogger(__name__)
 
 # ═══════════════════════════════════════════════════════════════════════════
 # ASYNC INDIAN MUSIC RECOMMENDATION SYSTEM (2000-2025)
@@ -23,9 +30,15 @@ class AsyncIndianMusicRecommender:
     Uses year-based "top songs" queries instead of artist names
     """
     
-    def __init__(self, max_workers=10):
-        self.yt = YTMusic()
+    def __init__(self, yt: YTMusic = None, max_workers=32):
+        # Reuse the app's client (and its pooled session) when given one
+        self.yt = yt if yt is not None else YTMusic()
         self.max_workers = max_workers
+        # One pool shared by every collection builder, so the six builders' queries
+        # all run in a single wave instead of six pools of their own
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ytm")
+        # Searches that raised during the current build (a partial build is never saved)
+        self.failed_queries = 0
         self.music_database = {
             'bollywood_2000s': [],
             'bollywood_2010s': [],
@@ -36,15 +49,16 @@ class AsyncIndianMusicRecommender:
         }
         self.current_year = 2025
     
-    def _search_query(self, query: str, limit: int = 4) -> List[Dict]:
-        """Single search query (blocking, to be run in thread pool)"""
+    def _search_query(self, query: str, limit: int = 4) -> Optional[List[Dict]]:
+        """Single search query (blocking, to be run in thread pool); None if it failed"""
         try:
             results = self.yt.search(query, filter="songs", limit=limit)
             songs = []
             for song in results:
                 # Extract thumbnail safely (Essential for UI)
-                thumbnails = song.get("thumbnails", [])
-                thumbnail_url = thumbnails[-1]["url"] if thumbnails else ""
+                thumbnails = song.get("thumbnails") or ()
+                thumbnail_url = thumbnails[-1].get("url", "") if thumbnails else ""
+                video_id = song.get('videoId')
                 
                 # Extract artist safely
                 artists = song.get('artists', [])
@@ -55,14 +69,13 @@ class AsyncIndianMusicRecommender:
                 songs.append({
                     'title': song.get('title'),
                     'artist': artist_name,
-                    'videoId': song.get('videoId'),
-                    'thumbnail': thumbnail_url,
-                    'music_url': f"https://music.youtube.com/watch?v={song.get('videoId')}"
+                    'videoId': video_id,
+                    'thumbnail': thumbnail_url
                 })
             return songs
         except Exception as e:
-            print(f"  ✗ Error with '{query[:40]}...': {e}")
-            return []
+            logger.warning("Recommender search failed for %r: %s", query[:40], e)
+            return None
     
     async def _async_search_queries(self, queries: List[tuple], category: str, era: str = None) -> List[Dict]:
         """
@@ -75,21 +88,29 @@ class AsyncIndianMusicRecommender:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Create futures for all queries
-            futures = [
-                loop.run_in_executor(executor, self._search_query, query, limit)
-                for query, limit in queries
-            ]
-            
-            # Wait for all to complete
-            results = await asyncio.gather(*futures)
+        # Create futures for all queries
+        futures = [
+            loop.run_in_executor(self._executor, self._search_query, query, limit)
+            for query, limit in queries
+        ]
         
-        # Flatten results and add metadata
+        # Wait for all to complete
+        results = await asyncio.gather(*futures)
+        
+        # Flatten results and add metadata; overlapping year queries often
+        # return the same song, so keep only its first occurrence
         all_songs = []
+        seen = set()
         for i, songs in enumerate(results):
             # query_name = queries[i][0]
+            if songs is None:
+                self.failed_queries += 1
+                continue
             for song in songs:
+                # Unplayable without a videoId (and they'd all collapse into one entry)
+                if not song['videoId'] or song['videoId'] in seen:
+                    continue
+                seen.add(song['videoId'])
                 song['category'] = category
                 song['era'] = era if era else 'multi'
                 song['year_range'] = self._get_year_range(category, era)
@@ -277,9 +298,9 @@ class AsyncIndianMusicRecommender:
     
     async def build_all_collections(self):
         """Build all collections in parallel"""
-        print("\n⚡ Building ALL collections in parallel (Background Task)...\n")
-        import time
+        logger.info("Building all recommender collections in the background")
         start_time = time.time()
+        self.failed_queries = 0
         
         # Run all collection builders in parallel
         await asyncio.gather(
@@ -296,10 +317,12 @@ class AsyncIndianMusicRecommender:
         
         total_songs = sum(len(songs) for songs in self.music_database.values())
         
-        print(f"\n{'='*80}")
-        print(f"⚡ ALL COLLECTIONS BUILT IN {elapsed:.2f} SECONDS")
-        print(f"📊 Total songs collected: {total_songs}")
-        print(f"{'='*80}\n")
+        logger.info("All collections built in %.2fs: %d songs (%d failed searches)",
+                    elapsed, total_songs, self.failed_queries)
+    
+    async def aclose(self):
+        """Stop the shared search pool (queued searches are dropped)"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
     
     def generate_dynamic_playlist(self, total_songs=50):
         """
@@ -337,7 +360,9 @@ class AsyncIndianMusicRecommender:
             current_bolly = len([s for s in playlist if s['category'] == 'bollywood'])
             remaining = bollywood_count - current_bolly
             if remaining > 0 and all_bollywood:
-                available = [s for s in all_bollywood if s not in playlist]
+                # Compare ids, not dicts: a set probe instead of a scan of the playlist
+                chosen_ids = {s.get('videoId') for s in playlist}
+                available = [s for s in all_bollywood if s.get('videoId') not in chosen_ids]
                 if available:
                     additional = random.sample(
                         available,
@@ -375,7 +400,47 @@ class AsyncIndianMusicRecommender:
         return playlist
     
     def save_database(self, filename='indian_music_2000_2025.json'):
-        """Save the entire music database"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(self.music_database, f, ensure_ascii=False, indent=2)
+        """Save the entire music database, plus a sibling .meta file with its build time"""
+        folder = os.path.dirname(filename)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # Compact JSON, gzipped when the name ends in .gz (repeated keys compress well)
+        with self._opener(filename)(filename, 'wb') as f:
+            f.write(orjson.dumps(self.music_database, option=orjson.OPT_NON_STR_KEYS))
+        with open(self._meta_path(filename), 'wb') as f:
+            f.write(orjson.dumps({'built_at': time.time()}))
         # print(f"✅ Database saved to {filename}")
+    
+    def load_database(self, filename='indian_music_2000_2025.json', max_age=86400) -> bool:
+        """Load a saved database if it is younger than max_age seconds. Returns True on success"""
+        try:
+            with open(self._meta_path(filename), 'rb') as f:
+                built_at = orjson.loads(f.read())['built_at']
+            if time.time() - built_at >= max_age:
+                return False
+            with self._opener(filename)(filename, 'rb') as f:
+                saved = orjson.loads(f.read())
+        except (OSError, EOFError, ValueError, KeyError, TypeError):
+            return False
+        for key in self.music_database:
+            self.music_database[key] = saved.get(key, [])
+        return True
+    
+    async def load_or_build(self, filename, max_age=86400):
+        """Reuse a fresh saved database; otherwise build all collections and save them"""
+        if await asyncio.to_thread(self.load_database, filename, max_age):
+            total_songs = sum(len(songs) for songs in self.music_database.values())
+            logger.info("Loaded %d songs from %s", total_songs, filename)
+            return
+        await self.build_all_collections()
+        # Don't pin an outage-damaged build for max_age: only save a complete one
+        if self.failed_queries == 0 and all(self.music_database.values()):
+            await asyncio.to_thread(self.save_database, filename)
+    
+    @staticmethod
+    def _opener(filename):
+        return functools.partial(gzip.open, compresslevel=3) if filename.endswith('.gz') else open
+    
+    @staticmethod
+    def _meta_path(filename):
+        return os.path.splitext(filename)[0] + '.meta'
@@ -1,18 +1,157 @@
 import re
+import time
+import functools
+import asyncio
+import threading
+from collections import deque
 import qrcode
 import base64
+import orjson
+import requests
 from io import BytesIO
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from fastapi.responses import JSONResponse
 
-def extract_time(line):
-    """Extract timestamp (in seconds) from a line like [01:02.38]text"""
-    match = re.match(r"\[(\d+):(\d{2})(?:\.(\d{1,3}))?\]", line)
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson instead of the stdlib encoder.
+    Kept on purpose: routes return plain dicts of track data with no response models,
+    and dumping those with orjson is several times cheaper than validating them into
+    models first. FastAPI's own ORJSONResponse is deprecated, hence this local copy.
+    """
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def build_requests_session(pool_maxsize: int = 50, timeout: float = 15) -> requests.Session:
+    """
+    A keep-alive session for blocking clients (ytmusicapi) shared across worker threads.
+    The pool is sized for the executor so concurrent calls don't discard connections,
+    and transient upstream errors are retried with backoff.
+    Every request gets `timeout`, since clients handed a session don't set their own.
+    """
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 502, 503, 504],
+        # YouTube Music's read-only API is called with POST
+        allowed_methods=frozenset({"GET", "POST"}),
+        # Back off ourselves: Retry-After on a 429 could park a worker thread for hours
+        respect_retry_after_header=False,
+    )
+    adapter = HTTPAdapter(pool_connections=20, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.request = functools.partial(session.request, timeout=timeout)
+    return session
+
+
+class AsyncRateLimiter:
+    """
+    Token bucket allowing `max_rate` acquisitions per `time_period` seconds.
+    Callers only wait when the bucket is empty; waiters are served in order.
+    """
+    def __init__(self, max_rate: float, time_period: float = 1.0):
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self._tokens = float(max_rate)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_rate, self._tokens + (now - self._updated) * self.max_rate / self.time_period)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) * self.time_period / self.max_rate)
+                self._refill()
+            self._tokens -= 1
+
+    def try_acquire(self) -> bool:
+        """Take a token only if one is free right now; never waits or jumps the queue."""
+        if self._lock.locked():
+            return False
+        self._refill()
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Thread-safe breaker over the last `window` calls. It opens for `cooldown` seconds
+    once at least `min_calls` were seen and more than `failure_ratio` of them failed
+    or took longer than `slow_call`; after that a single probe call decides whether it closes.
+    """
+    def __init__(self, window: int = 20, min_calls: int = 10, failure_ratio: float = 0.5,
+                 slow_call: float = 5.0, cooldown: float = 30.0):
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_call = slow_call
+        self.cooldown = cooldown
+        self._results = deque(maxlen=window)
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> tuple:
+        """Returns (allowed, probe); pass `probe` back to record() with the call's outcome."""
+        with self._lock:
+            if self._opened_at is None:
+                return True, False
+            if self._probing or time.monotonic() - self._opened_at < self.cooldown:
+                return False, False
+            # Half-open: let exactly one call through
+            self._probing = True
+            return True, True
+
+    def record(self, ok: bool, elapsed: float, probe: bool = False):
+        failed = not ok or elapsed > self.slow_call
+        with self._lock:
+            if probe:
+                # Only the half-open probe decides whether the breaker closes
+                self._probing = False
+                if failed:
+                    self._opened_at = time.monotonic()
+                else:
+                    self._opened_at = None
+                    self._results.clear()
+                return
+            if self._opened_at is not None:
+                # Admitted before the breaker opened; too late to count
+                return
+            self._results.append(failed)
+            if len(self._results) >= self.min_calls and sum(self._results) / len(self._results) > self.failure_ratio:
+                self._opened_at = time.monotonic()
+
+# LRC timestamp at the start of a line, and the lyric after it
+_LINE_RE = re.compile(r"\[(\d+):(\d{2})(?:\.(\d{1,3}))?\](.*)", re.DOTALL)
+
+def parse_lrc_line(line):
+    """Split a line like [01:02.38]text into (seconds, text) with one regex match, or None"""
+    match = _LINE_RE.match(line)
     if not match:
         return None
-    minutes = int(match.group(1))
-    seconds = int(match.group(2))
-    fraction = match.group(3) or "0"
-    frac_value = int(fraction) / (10 ** len(fraction))
-    return minutes * 60 + seconds + frac_value
+    minutes, seconds, fraction, text = match.groups()
+    frac_value = int(fraction) / (10 ** len(fraction)) if fraction else 0.0
+    return int(minutes) * 60 + int(seconds) + frac_value, text.strip()
 
 def detect_verses(data, gap_threshold=8.0):
     """
@@ -39,10 +178,10 @@ def detect_verses(data, gap_threshold=8.0):
     for i, line in enumerate(data):
         if not isinstance(line, str):
              continue
-        time = extract_time(line)
-        if time is None:
+        parsed = parse_lrc_line(line)
+        if parsed is None:
             continue
-        text = re.sub(r"^\[.*?\]", "", line).strip()
+        time, text = parsed
 
         # first line → start of first verse
         if prev_time is None:
@@ -56,17 +195,16 @@ def detect_verses(data, gap_threshold=8.0):
 
     return verses
 
-def find_video_id(out_tracks, target_title):
+def index_video_ids(out_tracks) -> dict:
     """
-    Finds the videoId for a given title. Returns None if not found.
+    Maps each title to the videoId of its first track (first match wins on duplicates).
     """
-    if not out_tracks or not target_title:
-        return None
-    
-    return next(
-        (track['videoId'] for track in out_tracks if track.get("title") == target_title),
-        None
-    )
+    index = {}
+    for track in out_tracks:
+        title = track.get("title")
+        if title and title not in index:
+            index[title] = track['videoId']
+    return index
 
 def generate_qr_base64(url: str) -> str:
     qr = qrcode.QRCode(